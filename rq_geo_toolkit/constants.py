@@ -5,8 +5,15 @@ from typing import Literal
 GEOMETRY_COLUMN = "geometry"
 
 PARQUET_ROW_GROUP_SIZE = 100_000
+# Used for adaptive row group size calculation
+PARQUET_TARGET_ROW_GROUP_BYTES = 128 * 1024**2
+PARQUET_MIN_ROW_GROUP_SIZE = 50_000
+PARQUET_MAX_ROW_GROUP_SIZE = 1_000_000
 PARQUET_COMPRESSION = "zstd"
 PARQUET_COMPRESSION_LEVEL = 3
 PARQUET_VERSION: Literal["v2"] = "v2"
 
+# Used for temporary files that are read only once and removed afterwards
+TEMPORARY_PARQUET_COMPRESSION: Literal["lz4"] = "lz4"
+
 MEMORY_1GB = 1024**3
@@ -3,11 +3,11 @@
 import secrets
 import sys
 import tempfile
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import AbstractContextManager, nullcontext
 from functools import partial
 from math import ceil
 from pathlib import Path
-from time import sleep
 from typing import TYPE_CHECKING, Any, Callable, Optional, Union
 
 if sys.version_info >= (3, 12):
@@ -49,6 +49,7 @@ class DuckDBConnKwargs(TypedDict, total=False):  # noqa: D101
 
 
 DUCKDB_ABOVE_130 = version.parse(duckdb.__version__) >= version.parse("1.3.0")
+DUCKDB_ABOVE_140 = version.parse(duckdb.__version__) >= version.parse("1.4.0")
 
 
 def sql_escape(value: str) -> str:
@@ -60,6 +61,7 @@ def set_up_duckdb_connection(
     tmp_dir_path: Union[str, Path],
     preserve_insertion_order: bool = False,
     duckdb_conn_kwargs: Optional[DuckDBConnKwargs] = None,
+    in_memory: bool = False,
 ) -> "duckdb.DuckDBPyConnection":
     """
     Create DuckDB connection in a given directory.
@@ -71,6 +73,9 @@ def set_up_duckdb_connection(
             Used only with external process. Defaults to False.
         duckdb_conn_kwargs (Optional[DuckDBConnKwargs], optional): Additional kwargs used to
             provision a duckdb connection. Defaults to None.
+        in_memory (bool, optional): Whether to create an in-memory database instead of
+            a database file. Given directory is then used only as a temporary directory
+            for data spilled to disk. Defaults to False.
 
     Returns:
         duckdb.DuckDBPyConnection: DuckDB connection object.
@@ -85,37 +90,47 @@ def set_up_duckdb_connection(
     local_db_file = "db.duckdb" if not randomize_db_file_name else f"{secrets.token_hex(16)}.duckdb"
 
     # prepare config params
-    config_params = config_kwargs or {}
+    config_params = dict(config_kwargs or {})
     if "preserve_insertion_order" not in config_params:
         config_params["preserve_insertion_order"] = preserve_insertion_order
 
     # create connection in a given path
     full_path = Path(tmp_dir_path) / local_db_file
     full_path.parent.mkdir(exist_ok=True, parents=True)
-    connection = duckdb.connect(
-        database=str(full_path),
-        config=config_params,
-    )
+    if in_memory:
+        if "temp_directory" not in config_params:
+            config_params["temp_directory"] = str(full_path.parent)
+        connection = duckdb.connect(database=":memory:", config=config_params)
+    else:
+        connection = duckdb.connect(
+            database=str(full_path),
+            config=config_params,
+        )
 
     # execute provisioning queries
-    connection.execute("SET enable_progress_bar = false;")
-    connection.execute("SET enable_progress_bar_print = false;")
+    # progress bar options are local (per-connection) and can't be passed in the config
+    connection.execute("SET enable_progress_bar = false; SET enable_progress_bar_print = false;")
     if provisioning_queries is not None:
         if isinstance(provisioning_queries, str):
             provisioning_queries = [provisioning_queries]
         for query in provisioning_queries:
             connection.execute(query)
 
+    # skip installation of extensions already present in the extension directory
+    installed_extensions = _get_installed_extensions(connection)
+
     # install and load official extensions
     official_extensions_to_load = official_extensions_to_load or ["spatial"]
     for official_extension_to_load in official_extensions_to_load:
-        connection.install_extension(official_extension_to_load)
+        if official_extension_to_load not in installed_extensions:
+            connection.install_extension(official_extension_to_load)
         connection.load_extension(official_extension_to_load)
 
     # install and load community extensions
     community_extensions_to_load = community_extensions_to_load or []
     for community_extension_to_load in community_extensions_to_load:
-        connection.install_extension(community_extension_to_load, repository="community")
+        if community_extension_to_load not in installed_extensions:
+            connection.install_extension(community_extension_to_load, repository="community")
         connection.load_extension(community_extension_to_load)
 
     return connection
@@ -131,8 +146,24 @@ def run_duckdb_query_function_with_memory_limit(
     current_memory_gb_limit: Optional[float] = None,
     limit_memory: bool = True,
     duckdb_conn_kwargs: Optional[DuckDBConnKwargs] = None,
+    in_process_first_attempt: bool = False,
+    reuse_tmp_dir_on_first_attempt: bool = False,
 ) -> tuple[float, int]:
-    """Run function with duckdb query and limit threads automatically."""
+    """
+    Run function with duckdb query and limit threads automatically.
+
+    Each attempt is executed in an external process with memory monitoring and each retry after
+    an out of memory error uses lower number of resources.
+
+    If `in_process_first_attempt` is enabled, the first attempt is executed in the current process
+    instead. It is guarded only by the DuckDB memory limit, without the system memory watchdog,
+    and memory allocated by DuckDB may stay in the current process after the query finishes.
+
+    Each attempt gets a clean temporary directory nested in `tmp_dir_path`. If
+    `reuse_tmp_dir_on_first_attempt` is enabled, the first attempt uses `tmp_dir_path` directly.
+    It should be enabled only for functions using an in-memory DuckDB connection, that don't
+    leave any database files in the directory.
+    """
     current_memory_gb_limit = current_memory_gb_limit or ceil(
         psutil.virtual_memory().total / MEMORY_1GB
     )
@@ -141,9 +172,18 @@ def run_duckdb_query_function_with_memory_limit(
         or duckdb.sql("SELECT current_setting('threads') AS threads").fetchone()[0]
     )
 
+    is_first_attempt = True
+    run_in_current_process = in_process_first_attempt
+
     while True:
+        # clean nested directory is always created for retries, after a failed write
+        tmp_dir_context: AbstractContextManager[str] = (
+            nullcontext(str(tmp_dir_path))
+            if is_first_attempt and reuse_tmp_dir_on_first_attempt
+            else tempfile.TemporaryDirectory(dir=Path(tmp_dir_path).resolve())
+        )
         try:
-            with tempfile.TemporaryDirectory(dir=Path(tmp_dir_path).resolve()) as tmp_dir_name:
+            with tmp_dir_context as tmp_dir_name:
                 nested_tmp_dir_path = Path(tmp_dir_name)
                 f = partial(
                     function,
@@ -152,11 +192,17 @@ def run_duckdb_query_function_with_memory_limit(
                     tmp_dir_path=nested_tmp_dir_path,
                     duckdb_conn_kwargs=duckdb_conn_kwargs,
                 )
-                process = WorkerProcess(target=f, args=args or (), kwargs=kwargs or {})
-                run_process_with_memory_monitoring(process)
+                if run_in_current_process:
+                    f(*(args or ()), **(kwargs or {}))
+                else:
+                    process = WorkerProcess(target=f, args=args or (), kwargs=kwargs or {})
+                    run_process_with_memory_monitoring(process)
 
             return current_memory_gb_limit, current_threads_limit
         except (duckdb.OutOfMemoryException, MemoryError) as ex:
+            is_first_attempt = False
+            run_in_current_process = False
+
             if current_threads_limit == 1 and (current_memory_gb_limit < 1 or not limit_memory):
                 raise MemoryError("Not enough memory to run the query.") from ex
             elif current_threads_limit > 1:
@@ -190,6 +236,7 @@ def run_query_with_memory_monitoring(
     preserve_insertion_order: bool = False,
     limit_memory: bool = True,
     duckdb_conn_kwargs: Optional[DuckDBConnKwargs] = None,
+    in_process_first_attempt: bool = False,
 ) -> None:
     """
     Run SQL query and raise exception if memory threshold is exceeded.
@@ -209,6 +256,10 @@ def run_query_with_memory_monitoring(
             Defaults to True.
         duckdb_conn_kwargs (Optional[DuckDBConnKwargs], optional): Additional kwargs used to
             provision a duckdb connection. Defaults to None.
+        in_process_first_attempt (bool, optional): Whether to run the first attempt in the
+            current process instead of an external one. Used only with `tmp_dir_path`. It is
+            guarded only by the DuckDB memory limit, without the system memory watchdog.
+            Defaults to False.
     """
     if tmp_dir_path is connection is None:
         raise ValueError("Must pass tmp_dir_path or connection.")
@@ -226,6 +277,9 @@ def run_query_with_memory_monitoring(
             function=_run_query,
             kwargs=dict(sql_query=sql_query, preserve_insertion_order=preserve_insertion_order),
             duckdb_conn_kwargs=duckdb_conn_kwargs,
+            in_process_first_attempt=in_process_first_attempt,
+            # function uses an in-memory connection
+            reuse_tmp_dir_on_first_attempt=True,
         )
     elif connection is not None:
         current_memory_gb_limit = ceil(psutil.virtual_memory().total / MEMORY_1GB)
@@ -251,14 +305,15 @@ def run_query_with_memory_monitoring(
                     )
 
                     sleep_time = 0.1
-                    while query_execution_future.running():
+                    while not query_execution_future.done():
                         actual_memory = psutil.virtual_memory()
                         if actual_memory.percent > percentage_threshold:  # pragma: no cover
                             connection.interrupt()
                             query_execution_future.cancel()
                             raise MemoryError()
 
-                        sleep(sleep_time)
+                        # returns as soon as the query finishes
+                        wait([query_execution_future], timeout=sleep_time)
                         sleep_time = min(sleep_time + 0.1, 1.0)
 
                     query_execution_future.exception()
@@ -301,21 +356,20 @@ def _run_query(
     current_threads_limit: int,
     tmp_dir_path: Path,
     duckdb_conn_kwargs: Optional[DuckDBConnKwargs] = None,
-) -> None:  # pragma: no cover
-    duckdb_conn_kwargs = duckdb_conn_kwargs or {}
+) -> None:
+    # copy kwargs to avoid modifying the caller's object when running in the current process
+    duckdb_conn_kwargs = DuckDBConnKwargs(**(duckdb_conn_kwargs or {}))
     duckdb_conn_kwargs["provisioning_queries"] = [
         *duckdb_conn_kwargs.get("provisioning_queries", []),
         f"SET memory_limit = '{current_memory_gb_limit}GB';",
         f"SET threads = {current_threads_limit};",
     ]
-    with (
-        tempfile.TemporaryDirectory(dir=tmp_dir_path) as tmp_dir_name,
-        set_up_duckdb_connection(
-            tmp_dir_path=Path(tmp_dir_name),
-            preserve_insertion_order=preserve_insertion_order,
-            duckdb_conn_kwargs=duckdb_conn_kwargs,
-        ) as conn,
-    ):
+    with set_up_duckdb_connection(
+        tmp_dir_path=tmp_dir_path,
+        preserve_insertion_order=preserve_insertion_order,
+        duckdb_conn_kwargs=duckdb_conn_kwargs,
+        in_memory=True,
+    ) as conn:
         conn.sql(sql_query)
 
 
@@ -323,3 +377,10 @@ def _run_query_with_existing_connection(
     sql_query: str, connection: duckdb.DuckDBPyConnection
 ) -> None:
     connection.execute(sql_query)
+
+
+def _get_installed_extensions(connection: duckdb.DuckDBPyConnection) -> set[str]:
+    installed_extensions = connection.execute(
+        "SELECT extension_name FROM duckdb_extensions() WHERE installed;"
+    ).fetchall()
+    return {extension_name for (extension_name,) in installed_extensions}
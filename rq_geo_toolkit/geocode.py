@@ -2,11 +2,17 @@
 
 import hashlib
 import json
+import os
+import secrets
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Any, Optional, Union, cast, overload
 
+import shapely
+from geopy.extra.rate_limiter import RateLimiter
 from geopy.geocoders.nominatim import Nominatim
 from geopy.location import Location
+from shapely import wkb
 from shapely.geometry import shape
 from shapely.geometry.base import BaseGeometry
 from shapely.ops import unary_union
@@ -15,6 +21,15 @@ from rq_geo_toolkit._exceptions import QueryNotGeocodedError
 
 USER_AGENT = "RQ Geo Toolkit Python package (https://github.com/kraina-ai/rq_geo_toolkit)"
 
+# Nominatim usage policy allows at most 1 request per second
+NOMINATIM_MIN_DELAY_SECONDS = 1.0
+MAX_GEOCODING_WORKERS = 4
+
+# Available since shapely 2.1 with GEOS 3.12
+DISJOINT_SUBSET_UNION_AVAILABLE = hasattr(
+    shapely, "disjoint_subset_union_all"
+) and shapely.geos_version >= (3, 12, 0)
+
 
 @overload
 def geocode_to_geometry(query: str) -> BaseGeometry: ...
@@ -27,17 +42,27 @@ def geocode_to_geometry(query: list[str]) -> BaseGeometry: ...
 def geocode_to_geometry(query: Union[str, list[str]]) -> BaseGeometry:
     """Geocode a query to a (Multi)Polygon geometry using Nominatim."""
     if not isinstance(query, str):
-        return unary_union([geocode_to_geometry(sub_query) for sub_query in query])
+        if len(query) == 1:
+            return _union_geometries([geocode_to_geometry(query[0])])
+
+        # requests are rate limited, workers only overlap the waiting for responses
+        with ThreadPoolExecutor(max_workers=MAX_GEOCODING_WORKERS) as executor:
+            return _union_geometries(list(executor.map(geocode_to_geometry, query)))
 
-    h = hashlib.new("sha256")
-    h.update(query.encode())
-    query_hash = h.hexdigest()
-    query_file_path = Path("cache").resolve() / f"{query_hash}.json"
+    cache_directory_path = Path("cache").resolve()
+    # hash is used only as a cache key, so there is no need for a cryptographic hash function
+    query_hash = hashlib.blake2b(query.encode(), digest_size=16).hexdigest()
+    query_file_path = cache_directory_path / f"{query_hash}.wkb"
 
-    if not query_file_path.exists():
-        query_results = Nominatim(user_agent=USER_AGENT).geocode(
-            query, geometry="geojson", exactly_one=False
-        )
+    if query_file_path.exists():
+        return cast("BaseGeometry", wkb.loads(query_file_path.read_bytes()))
+
+    # GeoJSON cache files keyed with sha256 were saved by previous versions of the library
+    legacy_query_hash = hashlib.sha256(query.encode()).hexdigest()
+    geojson_query_file_path = cache_directory_path / f"{legacy_query_hash}.json"
+
+    if not geojson_query_file_path.exists():
+        query_results = _rate_limited_nominatim_geocode(query)
 
         if not query_results:
             raise QueryNotGeocodedError(f"Zero results from Nominatim for query '{query}'.")
@@ -46,13 +71,57 @@ def geocode_to_geometry(query: Union[str, list[str]]) -> BaseGeometry:
 
         if not polygon_result:
             raise QueryNotGeocodedError(f"No polygon found for query '{query}'.")
-
-        query_file_path.parent.mkdir(parents=True, exist_ok=True)
-        query_file_path.write_text(json.dumps(polygon_result))
+        geometry = shape(polygon_result)
+        _save_geometry_to_cache(geometry, query_file_path)
     else:
-        polygon_result = json.loads(query_file_path.read_text())
+        geometry = shape(json.loads(geojson_query_file_path.read_text()))
+        _save_geometry_to_cache(geometry, query_file_path)
+        # converted GeoJSON cache file is no longer needed
+        geojson_query_file_path.unlink(missing_ok=True)
+
+    return geometry
+
+
+# geocoder (and its HTTP session) is created once and shared between all geocoding calls
+_nominatim = Nominatim(user_agent=USER_AGENT)
+
+
+def _nominatim_geocode(query: str) -> Optional[list[Location]]:
+    return cast(
+        "Optional[list[Location]]",
+        _nominatim.geocode(query, geometry="geojson", exactly_one=False),
+    )
 
-    return unary_union(shape(polygon_result))
+
+# RateLimiter is thread-safe and shared between all geocoding calls
+_rate_limited_nominatim_geocode = RateLimiter(
+    _nominatim_geocode,
+    min_delay_seconds=NOMINATIM_MIN_DELAY_SECONDS,
+    max_retries=0,
+    swallow_exceptions=False,
+)
+
+
+def _save_geometry_to_cache(geometry: BaseGeometry, query_file_path: Path) -> None:
+    """Save geometry as WKB using a temporary file to avoid reading partially written cache."""
+    query_file_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_query_file_path = query_file_path.with_name(
+        f"{query_file_path.name}.{secrets.token_hex(8)}.tmp"
+    )
+    tmp_query_file_path.write_bytes(geometry.wkb)
+    os.replace(tmp_query_file_path, query_file_path)
+
+
+def _union_geometries(geometries: list[BaseGeometry]) -> BaseGeometry:
+    """
+    Union geocoded (Multi)Polygon geometries.
+
+    Uses disjoint subset union if available, since geocoded regions rarely overlap.
+    """
+    if len(geometries) > 1 and DISJOINT_SUBSET_UNION_AVAILABLE:
+        return cast("BaseGeometry", shapely.disjoint_subset_union_all(geometries))
+
+    return unary_union(geometries)
 
 
 def _get_first_polygon(results: list[Location]) -> Optional[dict[str, Any]]:
@@ -64,9 +133,14 @@ def _get_first_polygon(results: list[Location]) -> Optional[dict[str, Any]]:
     polygon_types = {"Polygon", "MultiPolygon"}
 
     # sorting fix from https://github.com/gboeing/osmnx/pull/1290/files
-    for result in sorted(results, key=lambda location: location.raw["importance"], reverse=True):
-        geojson_dict = cast("dict[str, Any]", result.raw["geojson"])
-        if geojson_dict["type"] in polygon_types:
-            return geojson_dict
+    # single pass instead of sorting, max keeps the first result in case of equal importance
+    first_polygon_result = max(
+        (result for result in results if result.raw["geojson"]["type"] in polygon_types),
+        key=lambda location: location.raw["importance"],
+        default=None,
+    )
+
+    if first_polygon_result is None:
+        return None
 
-    return None
+    return cast("dict[str, Any]", first_polygon_result.raw["geojson"])
@@ -1,19 +1,25 @@
 """Module for compressing GeoParquet files."""
 
+import shutil
 import tempfile
+from functools import lru_cache
 from pathlib import Path
-from typing import TYPE_CHECKING, Literal, Optional, Union, cast
+from typing import TYPE_CHECKING, Any, Literal, Optional, Union, cast
 
 import pyarrow.parquet as pq
 
 from rq_geo_toolkit.constants import (
     PARQUET_COMPRESSION,
     PARQUET_COMPRESSION_LEVEL,
+    PARQUET_MAX_ROW_GROUP_SIZE,
+    PARQUET_MIN_ROW_GROUP_SIZE,
     PARQUET_ROW_GROUP_SIZE,
+    PARQUET_TARGET_ROW_GROUP_BYTES,
     PARQUET_VERSION,
 )
 from rq_geo_toolkit.duckdb import (
     DUCKDB_ABOVE_130,
+    DUCKDB_ABOVE_140,
     DuckDBConnKwargs,
     run_duckdb_query_function_with_memory_limit,
     set_up_duckdb_connection,
@@ -23,22 +29,34 @@ from rq_geo_toolkit.duckdb import (
 if TYPE_CHECKING:  # pragma: no cover
     from rq_geo_toolkit.rich_utils import VERBOSITY_MODE
 
+# compression level of these codecs isn't saved in the parquet file
+_COMPRESSION_CODECS_WITH_LEVEL = ("zstd",)
+
 
 def compress_parquet_with_duckdb(
     input_file_path: Union[Path, list[Path]],
     output_file_path: Path,
     compression: str = PARQUET_COMPRESSION,
     compression_level: int = PARQUET_COMPRESSION_LEVEL,
-    row_group_size: int = PARQUET_ROW_GROUP_SIZE,
+    row_group_size: Union[int, Literal["auto"]] = PARQUET_ROW_GROUP_SIZE,
     parquet_version: Literal["v1", "v2"] = PARQUET_VERSION,
     working_directory: Union[str, Path] = "files",
     parquet_metadata: Optional[pq.FileMetaData] = None,
     verbosity_mode: "VERBOSITY_MODE" = "transient",
     duckdb_conn_kwargs: Optional[DuckDBConnKwargs] = None,
+    preserve_insertion_order: bool = True,
+    skip_if_compressed: bool = False,
+    in_process_first_attempt: bool = False,
 ) -> Path:
     """
     Compresses a GeoParquet file while keeping its metadata.
 
+    If a single input file written by DuckDB is already compressed using the same compression
+    codec, row group size and parquet version (and has the same metadata), it is copied without
+    re-encoding.
+    Compression level isn't saved in the parquet file, so for zstd compression the file is
+    copied only if `skip_if_compressed` is enabled.
+
     Args:
         input_file_path (Union[Path, list[Path]]): Input GeoParquet file path (or paths).
         output_file_path (Path): Output GeoParquet file path.
@@ -49,20 +67,31 @@ def compress_parquet_with_duckdb(
         compression_level (int, optional): Compression level of the final parquet file.
             Check https://duckdb.org/docs/sql/statements/copy#parquet-options for more info.
             Supported only for zstd compression. Defaults to 3.
-        row_group_size (int, optional): Approximate number of rows per row group in the final
-            parquet file. Defaults to 100_000.
+        row_group_size (Union[int, Literal["auto"]], optional): Approximate number of rows per
+            row group in the final parquet file. If "auto", will be calculated from the parquet
+            metadata to target ~128MB (uncompressed) row groups. Defaults to 100_000.
         parquet_version (Literal["v1", "v2"], optional): What type of parquet version use to
             save final file. Defaults to "v2".
         working_directory (Union[str, Path], optional): Directory where to save
             the downloaded `*.parquet` files. Defaults to "files".
         parquet_metadata (Optional[pq.FileMetaData], optional): GeoParquet file metadata used to
-            copy. If not provided, will load the metadata from the input file. Defaults to None.
+            copy. If not provided, will load the metadata from the input file (or the first
+            input file if multiple paths are provided). Defaults to None.
         verbosity_mode (Literal["silent", "transient", "verbose"], optional): Set progress
             verbosity mode. Can be one of: silent, transient and verbose. Silent disables
             output completely. Transient tracks progress, but removes output after finished.
             Verbose leaves all progress outputs in the stdout. Defaults to "transient".
         duckdb_conn_kwargs (Optional[DuckDBConnKwargs], optional): Additional kwargs used to
             provision a duckdb connection. Defaults to None.
+        preserve_insertion_order (bool, optional): Whether to keep the order of rows from
+            the input. Disabling it lets DuckDB write row groups without ordering them,
+            which reduces memory usage and runtime. Defaults to True.
+        skip_if_compressed (bool, optional): Whether to copy a single input file already
+            compressed with zstd codec without re-encoding, regardless of the compression level
+            used to save it. Defaults to False.
+        in_process_first_attempt (bool, optional): Whether to run the first attempt in the
+            current process instead of an external one. It is guarded only by the DuckDB memory
+            limit, without the system memory watchdog. Defaults to False.
     """
     is_single_path = isinstance(input_file_path, Path)
     if is_single_path:
@@ -73,16 +102,41 @@ def compress_parquet_with_duckdb(
 
     Path(working_directory).mkdir(parents=True, exist_ok=True)
 
-    if is_single_path and pq.read_metadata(input_file_path).num_rows == 0:
-        return cast("Path", input_file_path).rename(output_file_path)
-
     if is_single_path:
+        input_parquet_metadata = read_parquet_metadata(cast("Path", input_file_path))
+        if input_parquet_metadata.num_rows == 0:
+            return cast("Path", input_file_path).rename(output_file_path)
+
         sql_input_str = f"'{input_file_path}'"
     else:
+        # only the first file is used as a source of the metadata
+        input_parquet_metadata = (
+            read_parquet_metadata(cast("list[Path]", input_file_path)[0])
+            if parquet_metadata is None
+            else None
+        )
+
         mapped_paths = ", ".join(f"'{path}'" for path in cast("list[Path]", input_file_path))
         sql_input_str = f"[{mapped_paths}]"
 
-    parquet_metadata = parquet_metadata or pq.read_metadata(input_file_path)
+    parquet_metadata = parquet_metadata or input_parquet_metadata
+
+    can_skip_compression = skip_if_compressed or compression.lower() not in (
+        _COMPRESSION_CODECS_WITH_LEVEL
+    )
+    if (
+        is_single_path
+        and can_skip_compression
+        and _is_compressed_with_settings(
+            input_parquet_metadata=input_parquet_metadata,
+            parquet_metadata=parquet_metadata,
+            compression=compression,
+            row_group_size=row_group_size,
+            parquet_version=parquet_version,
+        )
+    ):
+        shutil.copyfile(cast("Path", input_file_path), output_file_path)
+        return output_file_path
 
     query = f"""
     SELECT original_data.*
@@ -100,6 +154,8 @@ def compress_parquet_with_duckdb(
         working_directory=working_directory,
         verbosity_mode=verbosity_mode,
         duckdb_conn_kwargs=duckdb_conn_kwargs,
+        preserve_insertion_order=preserve_insertion_order,
+        in_process_first_attempt=in_process_first_attempt,
     )
 
 
@@ -109,11 +165,13 @@ def compress_query_with_duckdb(
     output_file_path: Path,
     compression: str = PARQUET_COMPRESSION,
     compression_level: int = PARQUET_COMPRESSION_LEVEL,
-    row_group_size: int = PARQUET_ROW_GROUP_SIZE,
+    row_group_size: Union[int, Literal["auto"]] = PARQUET_ROW_GROUP_SIZE,
     parquet_version: Literal["v1", "v2"] = PARQUET_VERSION,
     working_directory: Union[str, Path] = "files",
     verbosity_mode: "VERBOSITY_MODE" = "transient",
     duckdb_conn_kwargs: Optional[DuckDBConnKwargs] = None,
+    preserve_insertion_order: bool = True,
+    in_process_first_attempt: bool = False,
 ) -> Path:
     """
     Compresses query to a GeoParquet file while keeping its metadata.
@@ -130,8 +188,9 @@ def compress_query_with_duckdb(
         compression_level (int, optional): Compression level of the final parquet file.
             Check https://duckdb.org/docs/sql/statements/copy#parquet-options for more info.
             Supported only for zstd compression. Defaults to 3.
-        row_group_size (int, optional): Approximate number of rows per row group in the final
-            parquet file. Defaults to 100_000.
+        row_group_size (Union[int, Literal["auto"]], optional): Approximate number of rows per
+            row group in the final parquet file. If "auto", will be calculated from the parquet
+            metadata to target ~128MB (uncompressed) row groups. Defaults to 100_000.
         parquet_version (Literal["v1", "v2"], optional): What type of parquet version use to
             save final file. Defaults to "v2".
         working_directory (Union[str, Path], optional): Directory where to save
@@ -142,11 +201,20 @@ def compress_query_with_duckdb(
             Verbose leaves all progress outputs in the stdout. Defaults to "transient".
         duckdb_conn_kwargs (Optional[DuckDBConnKwargs], optional): Additional kwargs used to
             provision a duckdb connection. Defaults to None.
+        preserve_insertion_order (bool, optional): Whether to keep the order of rows from
+            the input. Disabling it lets DuckDB write row groups without ordering them,
+            which reduces memory usage and runtime. Defaults to True.
+        in_process_first_attempt (bool, optional): Whether to run the first attempt in the
+            current process instead of an external one. It is guarded only by the DuckDB memory
+            limit, without the system memory watchdog. Defaults to False.
     """
     with tempfile.TemporaryDirectory(dir=Path(working_directory).resolve()) as tmp_dir_name:
         tmp_dir_path = Path(tmp_dir_name)
 
-        original_metadata_string = _parquet_schema_metadata_to_duckdb_kv_metadata(parquet_metadata)
+        original_metadata = _parquet_schema_metadata_to_duckdb_kv_metadata(parquet_metadata)
+
+        if row_group_size == "auto":
+            row_group_size = calculate_row_group_size(parquet_metadata)
 
         run_duckdb_query_function_with_memory_limit(
             tmp_dir_path=tmp_dir_path,
@@ -157,32 +225,131 @@ def compress_query_with_duckdb(
             kwargs=dict(
                 query=query,
                 output_file_path=output_file_path,
-                original_metadata_string=original_metadata_string,
+                original_metadata=original_metadata,
                 compression=compression,
                 compression_level=compression_level,
                 row_group_size=row_group_size,
                 parquet_version=parquet_version,
+                preserve_insertion_order=preserve_insertion_order,
             ),
             duckdb_conn_kwargs=duckdb_conn_kwargs,
+            in_process_first_attempt=in_process_first_attempt,
+            # function uses an in-memory connection
+            reuse_tmp_dir_on_first_attempt=True,
         )
 
     return output_file_path
 
 
+def read_parquet_metadata(file_path: Path) -> pq.FileMetaData:
+    """
+    Read parquet file metadata.
+
+    Parsed metadata is cached and reused until the file is modified.
+
+    Args:
+        file_path (Path): Parquet file path.
+
+    Returns:
+        pq.FileMetaData: Parquet file metadata.
+    """
+    file_stat = file_path.stat()
+    return _read_parquet_metadata_cached(
+        file_path.resolve().as_posix(), file_stat.st_mtime_ns, file_stat.st_size
+    )
+
+
+@lru_cache(maxsize=64)
+def _read_parquet_metadata_cached(
+    file_path: str, modification_time_ns: int, file_size: int
+) -> pq.FileMetaData:
+    # modification time and size are used only as a part of the cache key
+    return pq.read_metadata(file_path)
+
+
+def calculate_row_group_size(parquet_metadata: pq.FileMetaData) -> int:
+    """
+    Calculate number of rows per row group based on the average row size.
+
+    Targets ~128MB of uncompressed data per row group, clipped to the 50_000 - 1_000_000 range.
+
+    Args:
+        parquet_metadata (pq.FileMetaData): Parquet file metadata used to calculate
+            the average row size.
+
+    Returns:
+        int: Number of rows per row group.
+    """
+    total_byte_size = sum(
+        parquet_metadata.row_group(row_group_idx).total_byte_size
+        for row_group_idx in range(parquet_metadata.num_row_groups)
+    )
+    if parquet_metadata.num_rows == 0 or total_byte_size == 0:
+        return PARQUET_ROW_GROUP_SIZE
+
+    avg_row_bytes = total_byte_size / parquet_metadata.num_rows
+    return min(
+        max(int(PARQUET_TARGET_ROW_GROUP_BYTES / avg_row_bytes), PARQUET_MIN_ROW_GROUP_SIZE),
+        PARQUET_MAX_ROW_GROUP_SIZE,
+    )
+
+
+def _is_compressed_with_settings(
+    input_parquet_metadata: pq.FileMetaData,
+    parquet_metadata: pq.FileMetaData,
+    compression: str,
+    row_group_size: Union[int, Literal["auto"]],
+    parquet_version: Literal["v1", "v2"],
+) -> bool:
+    # footer format version matches DuckDB parquet version (data pages and encodings)
+    # only for files written by DuckDB
+    if not (input_parquet_metadata.created_by or "").startswith("DuckDB"):
+        return False
+
+    if input_parquet_metadata.metadata != parquet_metadata.metadata:
+        return False
+
+    if (input_parquet_metadata.format_version == "1.0") != (parquet_version == "v1"):
+        return False
+
+    if row_group_size == "auto":
+        row_group_size = calculate_row_group_size(parquet_metadata)
+
+    # DuckDB rounds row groups up to the full vector size (2048 rows)
+    max_row_group_size = row_group_size + 2048
+    expected_compression = compression.upper().replace("LZ4_RAW", "LZ4")
+    num_row_groups = input_parquet_metadata.num_row_groups
+    for row_group_idx in range(num_row_groups):
+        row_group = input_parquet_metadata.row_group(row_group_idx)
+        is_last_row_group = row_group_idx == num_row_groups - 1
+        if row_group.num_rows >= max_row_group_size or (
+            not is_last_row_group and row_group.num_rows < row_group_size
+        ):
+            return False
+
+        for column_idx in range(row_group.num_columns):
+            if row_group.column(column_idx).compression != expected_compression:
+                return False
+
+    return True
+
+
 def _compress_with_memory_limit(
     query: str,
     output_file_path: Path,
-    original_metadata_string: Optional[str],
+    original_metadata: Optional[dict[str, str]],
     compression: str,
     compression_level: int,
     row_group_size: int,
     parquet_version: str,
+    preserve_insertion_order: bool,
     current_memory_gb_limit: float,
     current_threads_limit: int,
     tmp_dir_path: Path,
     duckdb_conn_kwargs: Optional[DuckDBConnKwargs] = None,
 ) -> None:
-    duckdb_conn_kwargs = duckdb_conn_kwargs or {}
+    # copy kwargs to avoid modifying the caller's object when running in the current process
+    duckdb_conn_kwargs = DuckDBConnKwargs(**(duckdb_conn_kwargs or {}))
     duckdb_conn_kwargs["provisioning_queries"] = [
         *duckdb_conn_kwargs.get("provisioning_queries", []),
         "SET enable_geoparquet_conversion = false;",
@@ -191,42 +358,49 @@ def _compress_with_memory_limit(
     ]
     connection = set_up_duckdb_connection(
         tmp_dir_path,
-        preserve_insertion_order=True,
+        preserve_insertion_order=preserve_insertion_order,
         duckdb_conn_kwargs=duckdb_conn_kwargs,
+        in_memory=True,
     )
 
-    parquet_version_query = f"PARQUET_VERSION {parquet_version}," if DUCKDB_ABOVE_130 else ""
-    compression_level_query = (
-        f"COMPRESSION_LEVEL {compression_level}," if compression == "zstd" else ""
-    )
-    kv_metadata_query = (
-        f"KV_METADATA {original_metadata_string}," if original_metadata_string is not None else ""
-    )
-    connection.execute(
-        f"""
-        COPY ({query}) TO '{output_file_path}' (
-            FORMAT parquet,
-            {parquet_version_query}
-            COMPRESSION {compression},
-            {compression_level_query}
-            {kv_metadata_query}
-            ROW_GROUP_SIZE {row_group_size}
-        );
-        """
-    )
+    copy_options: dict[str, Any] = {}
+    if DUCKDB_ABOVE_130:
+        copy_options["PARQUET_VERSION"] = parquet_version
+    copy_options["COMPRESSION"] = compression
+    if compression == "zstd":
+        copy_options["COMPRESSION_LEVEL"] = compression_level
+    if original_metadata:
+        copy_options["KV_METADATA"] = original_metadata
+    copy_options["ROW_GROUP_SIZE"] = row_group_size
+
+    if DUCKDB_ABOVE_140:
+        # bind options as parameters to avoid parsing (potentially huge) metadata literals
+        options_query = ", ".join(f"{option} ?" for option in copy_options)
+        connection.execute(
+            f"COPY ({query}) TO ? (FORMAT parquet, {options_query});",
+            [str(output_file_path), *copy_options.values()],
+        )
+    else:
+        if original_metadata:
+            copy_options["KV_METADATA"] = _kv_metadata_to_duckdb_struct(original_metadata)
+        options_query = ", ".join(f"{option} {value}" for option, value in copy_options.items())
+        connection.execute(
+            f"COPY ({query}) TO '{output_file_path}' (FORMAT parquet, {options_query});"
+        )
 
     connection.close()
 
 
 def _parquet_schema_metadata_to_duckdb_kv_metadata(
     parquet_file_metadata: pq.FileMetaData,
-) -> Optional[str]:
+) -> Optional[dict[str, str]]:
     if parquet_file_metadata.metadata is None:
         return None
-    kv_pairs = []
-    for key, value in parquet_file_metadata.metadata.items():
-        escaped_key = sql_escape(key.decode())
-        escaped_value = sql_escape(value.decode())
-        kv_pairs.append(f"'{escaped_key}': '{escaped_value}'")
+    return {key.decode(): value.decode() for key, value in parquet_file_metadata.metadata.items()}
+
 
-    return "{ " + ", ".join(kv_pairs) + " }"
+def _kv_metadata_to_duckdb_struct(kv_metadata: dict[str, str]) -> str:
+    kv_pairs = ", ".join(
+        f"'{sql_escape(key)}': '{sql_escape(value)}'" for key, value in kv_metadata.items()
+    )
+    return f"{{ {kv_pairs} }}"
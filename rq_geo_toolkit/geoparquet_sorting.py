@@ -5,7 +5,6 @@ import tempfile
 from pathlib import Path
 from typing import TYPE_CHECKING, Literal, Optional, Union
 
-import pyarrow.parquet as pq
 from duckdb import OutOfMemoryException
 from rich import print as rprint
 
@@ -14,13 +13,18 @@ from rq_geo_toolkit.constants import (
     PARQUET_COMPRESSION_LEVEL,
     PARQUET_ROW_GROUP_SIZE,
     PARQUET_VERSION,
+    TEMPORARY_PARQUET_COMPRESSION,
 )
 from rq_geo_toolkit.duckdb import (
     DuckDBConnKwargs,
     run_query_with_memory_monitoring,
     set_up_duckdb_connection,
 )
-from rq_geo_toolkit.geoparquet_compression import compress_parquet_with_duckdb
+from rq_geo_toolkit.geoparquet_compression import (
+    calculate_row_group_size,
+    compress_parquet_with_duckdb,
+    read_parquet_metadata,
+)
 
 if TYPE_CHECKING:  # pragma: no cover
     from collections.abc import Callable
@@ -37,7 +41,7 @@ def sort_geoparquet_file_by_geometry(
     sort_extent: Optional[tuple[float, float, float, float]] = None,
     compression: str = PARQUET_COMPRESSION,
     compression_level: int = PARQUET_COMPRESSION_LEVEL,
-    row_group_size: int = PARQUET_ROW_GROUP_SIZE,
+    row_group_size: Union[int, Literal["auto"]] = PARQUET_ROW_GROUP_SIZE,
     parquet_version: Literal["v1", "v2"] = PARQUET_VERSION,
     working_directory: Union[str, Path] = "files",
     verbosity_mode: "VERBOSITY_MODE" = "transient",
@@ -70,8 +74,9 @@ def sort_geoparquet_file_by_geometry(
         compression_level (int, optional): Compression level of the final parquet file.
             Check https://duckdb.org/docs/sql/statements/copy#parquet-options for more info.
             Supported only for zstd compression. Defaults to 3.
-        row_group_size (int, optional): Approximate number of rows per row group in the final
-            parquet file. Defaults to 100_000.
+        row_group_size (Union[int, Literal["auto"]], optional): Approximate number of rows per
+            row group in the final parquet file. If "auto", will be calculated from the parquet
+            metadata to target ~128MB (uncompressed) row groups. Defaults to 100_000.
         parquet_version (Literal["v1", "v2"], optional): What type of parquet version use to
             save final file. Defaults to "v2".
         working_directory (Union[str, Path], optional): Directory where to save
@@ -94,9 +99,14 @@ def sort_geoparquet_file_by_geometry(
 
     assert input_file_path.resolve().as_posix() != output_file_path.resolve().as_posix()
 
-    if pq.read_metadata(input_file_path).num_rows == 0:
+    original_metadata = read_parquet_metadata(input_file_path)
+
+    if original_metadata.num_rows == 0:
         return input_file_path.rename(output_file_path)
 
+    if row_group_size == "auto":
+        row_group_size = calculate_row_group_size(original_metadata)
+
     Path(working_directory).mkdir(parents=True, exist_ok=True)
 
     with tempfile.TemporaryDirectory(dir=Path(working_directory).resolve()) as tmp_dir_name:
@@ -117,8 +127,6 @@ def sort_geoparquet_file_by_geometry(
             duckdb_conn_kwargs=duckdb_conn_kwargs,
         )
 
-        original_metadata = pq.read_metadata(input_file_path)
-
         if remove_input_file:
             input_file_path.unlink()
 
@@ -135,6 +143,7 @@ def sort_geoparquet_file_by_geometry(
             parquet_metadata=original_metadata,
             verbosity_mode=verbosity_mode,
             duckdb_conn_kwargs=duckdb_conn_kwargs,
+            preserve_insertion_order=True,
         )
 
     return output_file_path
@@ -277,6 +286,7 @@ def _sort_with_duckdb(
         tmp_dir_path,
         preserve_insertion_order=True,
         duckdb_conn_kwargs=duckdb_conn_kwargs,
+        in_memory=True,
     )
 
     if sort_algorithm == "str":
@@ -297,7 +307,7 @@ def _sort_with_duckdb(
     relation = connection.sql(index_select_sql)
 
     index_file_path = tmp_dir_path / "order_index.parquet"
-    relation.to_parquet(str(index_file_path), compression="zstd")
+    relation.to_parquet(str(index_file_path), compression=TEMPORARY_PARQUET_COMPRESSION)
 
     total_rows = connection.read_parquet(str(index_file_path)).count("*").fetchone()[0]
     connection.close()
@@ -323,7 +333,8 @@ def _sort_with_duckdb(
                 ) input_data USING (file_row_number)
                 ORDER BY order_id
             ) TO '{output_dir_path}/{current_file_idx}.parquet' (
-                FORMAT 'parquet'
+                FORMAT 'parquet',
+                COMPRESSION {TEMPORARY_PARQUET_COMPRESSION}
             )
             """
             run_query_with_memory_monitoring(
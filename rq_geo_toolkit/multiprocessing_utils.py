@@ -2,7 +2,6 @@
 
 import multiprocessing
 import traceback
-from time import sleep
 from typing import Any, Optional
 
 import psutil
@@ -56,7 +55,8 @@ def run_process_with_memory_monitoring(process: WorkerProcess) -> None:
             process.join()
             raise MemoryError()
 
-        sleep(sleep_time)
+        # returns as soon as the process finishes
+        process.join(timeout=sleep_time)
         sleep_time = min(sleep_time + 0.1, 1.0)
 
     if process.exception:
@@ -1,12 +1,19 @@
 """Test if provisioning duckdb connection works."""
 
+import multiprocessing
 import tempfile
 from pathlib import Path
+from typing import Any
+from unittest.mock import patch
 
 import duckdb
 import pytest
 
-from rq_geo_toolkit.duckdb import run_query_with_memory_monitoring, set_up_duckdb_connection
+from rq_geo_toolkit.duckdb import (
+    run_duckdb_query_function_with_memory_limit,
+    run_query_with_memory_monitoring,
+    set_up_duckdb_connection,
+)
 from rq_geo_toolkit.geoparquet_sorting import sort_geoparquet_file_by_geometry
 from tests.conftest import load_biggest_overture_place_file_from_stac
 
@@ -35,6 +42,17 @@ def test_randomized_local_file_name() -> None:
         assert files_in_tmp_dir[0].stem != "db"
 
 
+def test_in_memory_connection() -> None:
+    """Test if in-memory connection doesn't create db file and spills to given directory."""
+    with (
+        tempfile.TemporaryDirectory(dir=Path.cwd()) as tmp_dir_name,
+        set_up_duckdb_connection(tmp_dir_path=tmp_dir_name, in_memory=True) as conn,
+    ):
+        assert not list(Path(tmp_dir_name).glob("*.duckdb"))
+        temp_directory = conn.sql("SELECT current_setting('temp_directory')").fetchone()[0]
+        assert Path(temp_directory) == Path(tmp_dir_name)
+
+
 def test_query_provisioning() -> None:
     """Test if query provisioning is executed."""
     with (
@@ -120,6 +138,62 @@ def test_missing_h3_community_extension() -> None:
         )
 
 
+def _raise_out_of_memory_in_main_process(**kwargs: Any) -> None:
+    if multiprocessing.parent_process() is None:
+        raise duckdb.OutOfMemoryException("Simulated out of memory error.")
+
+
+def test_retry_in_external_process() -> None:
+    """Test if out of memory error in the current process is retried in an external process."""
+    with tempfile.TemporaryDirectory(dir=Path.cwd()) as tmp_dir_name:
+        current_memory_gb_limit, current_threads_limit = (
+            run_duckdb_query_function_with_memory_limit(
+                tmp_dir_path=Path(tmp_dir_name),
+                function=_raise_out_of_memory_in_main_process,
+                verbosity_mode="silent",
+                current_memory_gb_limit=1,
+                current_threads_limit=4,
+                in_process_first_attempt=True,
+            )
+        )
+        assert current_memory_gb_limit == 1
+        assert current_threads_limit == 2
+
+
+def test_query_in_current_process() -> None:
+    """Test if first attempt of the query can be executed without an external process."""
+    with (
+        tempfile.TemporaryDirectory(dir=Path.cwd()) as tmp_dir_name,
+        patch("rq_geo_toolkit.duckdb.WorkerProcess", side_effect=AssertionError) as mock_process,
+    ):
+        output_file_path = Path(tmp_dir_name) / "output.parquet"
+        run_query_with_memory_monitoring(
+            f"COPY (SELECT range AS value FROM range(10)) TO '{output_file_path}'",
+            tmp_dir_path=Path(tmp_dir_name),
+            verbosity_mode="silent",
+            in_process_first_attempt=True,
+        )
+        mock_process.assert_not_called()
+        assert duckdb.sql(f"SELECT COUNT(*) FROM '{output_file_path}'").fetchone() == (10,)
+
+
+def _create_table_in_file_database(tmp_dir_path: Path, **kwargs: Any) -> None:
+    with set_up_duckdb_connection(tmp_dir_path=tmp_dir_path) as connection:
+        connection.execute("CREATE TABLE t AS SELECT 1 AS value;")
+
+
+def test_clean_temporary_directory_for_each_call() -> None:
+    """Test if file-based database from a previous call isn't reused by the next one."""
+    with tempfile.TemporaryDirectory(dir=Path.cwd()) as tmp_dir_name:
+        for _ in range(2):
+            run_duckdb_query_function_with_memory_limit(
+                tmp_dir_path=Path(tmp_dir_name),
+                function=_create_table_in_file_database,
+                verbosity_mode="silent",
+            )
+        assert not any(Path(tmp_dir_name).iterdir())
+
+
 def test_extension_installation_location() -> None:
     """Test if properly installs extensions."""
     download_file_url = load_biggest_overture_place_file_from_stac()
@@ -1,15 +1,25 @@
 """Tests for dedicated geocoding function."""
 
-from typing import Union
+import hashlib
+import json
+import threading
+from pathlib import Path
+from typing import Any, Union
 from unittest.mock import patch
 
 import pytest
 from geopy.geocoders.nominatim import Nominatim
+from geopy.location import Location
 from osmnx.geocoder import geocode_to_gdf
+from shapely.geometry import box, mapping
 
 from rq_geo_toolkit._exceptions import QueryNotGeocodedError
 from rq_geo_toolkit._geopandas_api_version import GEOPANDAS_NEW_API
-from rq_geo_toolkit.geocode import geocode_to_geometry
+from rq_geo_toolkit.geocode import (
+    NOMINATIM_MIN_DELAY_SECONDS,
+    _rate_limited_nominatim_geocode,
+    geocode_to_geometry,
+)
 
 
 @pytest.mark.parametrize(  # type: ignore
@@ -46,3 +56,78 @@ def test_geocoding_errors(query: Union[str, list[str]]) -> None:
     ):
         geocode_to_geometry(query)
         mock_method.assert_called_once()
+
+
+def test_geocoding_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test if GeoJSON cache is converted to WKB and reused without calling Nominatim."""
+    monkeypatch.chdir(tmp_path)
+    query = "rq_geo_toolkit cache test"
+    geometry = box(0, 0, 1, 1)
+
+    cache_directory = Path("cache")
+    cache_directory.mkdir()
+    geojson_file_path = cache_directory / f"{hashlib.sha256(query.encode()).hexdigest()}.json"
+    geojson_file_path.write_text(json.dumps(mapping(geometry)))
+
+    with patch.object(Nominatim, "geocode", side_effect=AssertionError) as mock_method:
+        assert geocode_to_geometry(query).equals(geometry)
+        assert len(list(cache_directory.glob("*.wkb"))) == 1
+        assert not geojson_file_path.exists()
+
+        assert geocode_to_geometry(query).equals(geometry)
+        mock_method.assert_not_called()
+
+
+def test_geocoding_rate_limit(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test if parallel geocoding of multiple queries respects Nominatim rate limit."""
+    monkeypatch.chdir(tmp_path)
+    geometries = {
+        f"rq_geo_toolkit rate limit test {idx}": box(idx, 0, idx + 1, 1) for idx in range(3)
+    }
+
+    # fake clock makes the test fast and independent from the threads scheduling
+    fake_time = [0.0]
+    fake_time_lock = threading.Lock()
+
+    def fake_sleep(seconds: float) -> None:
+        with fake_time_lock:
+            fake_time[0] += seconds
+
+    class SlotRecordingLock:
+        """Rate limiter lock recording acquired request slots before releasing."""
+
+        def __init__(self) -> None:
+            self.lock = threading.Lock()
+            self.slot_times: list[float] = []
+
+        def __enter__(self) -> None:
+            self.lock.acquire()
+
+        def __exit__(self, *args: Any) -> None:
+            last_call = _rate_limited_nominatim_geocode._last_call
+            if not self.slot_times or self.slot_times[-1] != last_call:
+                self.slot_times.append(last_call)
+            self.lock.release()
+
+    slot_recording_lock = SlotRecordingLock()
+    monkeypatch.setattr(_rate_limited_nominatim_geocode, "_clock", lambda: fake_time[0])
+    monkeypatch.setattr(_rate_limited_nominatim_geocode, "_sleep", fake_sleep)
+    monkeypatch.setattr(_rate_limited_nominatim_geocode, "_lock", slot_recording_lock)
+    monkeypatch.setattr(_rate_limited_nominatim_geocode, "_last_call", None)
+
+    def geocode(query: str, **kwargs: Any) -> list[Location]:
+        raw = {"importance": 1.0, "geojson": mapping(geometries[query])}
+        return [Location(query, (0, 0), raw)]
+
+    with patch.object(Nominatim, "geocode", side_effect=geocode) as mock_geocode:
+        result = geocode_to_geometry(list(geometries.keys()))
+
+    assert result.equals(box(0, 0, 3, 1))
+    assert mock_geocode.call_count == len(geometries)
+
+    slot_times = slot_recording_lock.slot_times
+    assert len(slot_times) == len(geometries)
+    assert all(
+        later - earlier >= NOMINATIM_MIN_DELAY_SECONDS
+        for earlier, later in zip(slot_times, slot_times[1:])
+    )
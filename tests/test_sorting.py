@@ -1,15 +1,26 @@
 """Tests for sorting and compressing geoparquet files."""
 
+import os
 import tempfile
 from pathlib import Path
 from typing import Literal
+from unittest.mock import patch
 
+import pyarrow as pa
 import pyarrow.parquet as pq
 import pytest
 from tqdm import tqdm
 
-from rq_geo_toolkit.duckdb import set_up_duckdb_connection
-from rq_geo_toolkit.geoparquet_compression import compress_parquet_with_duckdb
+from rq_geo_toolkit.constants import PARQUET_MAX_ROW_GROUP_SIZE, PARQUET_MIN_ROW_GROUP_SIZE
+from rq_geo_toolkit.duckdb import (
+    run_duckdb_query_function_with_memory_limit,
+    set_up_duckdb_connection,
+)
+from rq_geo_toolkit.geoparquet_compression import (
+    calculate_row_group_size,
+    compress_parquet_with_duckdb,
+    read_parquet_metadata,
+)
 from rq_geo_toolkit.geoparquet_sorting import sort_geoparquet_file_by_geometry
 from tests.conftest import load_biggest_overture_place_file_from_stac
 
@@ -84,3 +95,138 @@ def test_sorting(sort_algorithm: Literal["str", "hilbert"], unsorted_example_fil
         # Spatial sorting clusters nearby geometries, which compresses better than the
         # original random order - so each algorithm must produce a smaller file.
         assert unsorted_pq.stat().st_size > sorted_pq.stat().st_size
+
+
+@pytest.mark.parametrize(  # type: ignore
+    "value_length,expected_min,expected_max",
+    [
+        (10, PARQUET_MAX_ROW_GROUP_SIZE, PARQUET_MAX_ROW_GROUP_SIZE),
+        # ~128MB divided by ~1KB per row
+        (1_000, 125_000, 135_000),
+        (10_000, PARQUET_MIN_ROW_GROUP_SIZE, PARQUET_MIN_ROW_GROUP_SIZE),
+    ],
+)
+def test_calculate_row_group_size(
+    value_length: int, expected_min: int, expected_max: int, tmp_path: Path
+) -> None:
+    """Test if adaptive row group size is calculated from average row size and clipped."""
+    file_path = tmp_path / "rows.parquet"
+    pq.write_table(
+        pa.table({"value": [os.urandom(value_length) for _ in range(1_000)]}),
+        file_path,
+        use_dictionary=False,
+        compression="none",
+    )
+
+    row_group_size = calculate_row_group_size(pq.read_metadata(file_path))
+
+    assert expected_min <= row_group_size <= expected_max
+
+
+def test_compression_without_reencoding(tmp_path: Path) -> None:
+    """Test if already compressed file is copied instead of being compressed again."""
+    input_file_path = tmp_path / "input.parquet"
+    pq.write_table(pa.table({"value": list(range(1_000))}), input_file_path)
+
+    lz4_file_path = compress_parquet_with_duckdb(
+        input_file_path=input_file_path,
+        output_file_path=tmp_path / "lz4.parquet",
+        compression="lz4",
+        working_directory=tmp_path,
+    )
+    assert pq.read_metadata(lz4_file_path).row_group(0).column(0).compression == "LZ4"
+
+    with patch(
+        "rq_geo_toolkit.geoparquet_compression.run_duckdb_query_function_with_memory_limit",
+        side_effect=AssertionError,
+    ) as mock_function:
+        copied_file_path = compress_parquet_with_duckdb(
+            input_file_path=lz4_file_path,
+            output_file_path=tmp_path / "lz4_copied.parquet",
+            compression="lz4",
+            working_directory=tmp_path,
+        )
+        mock_function.assert_not_called()
+
+    assert copied_file_path.read_bytes() == lz4_file_path.read_bytes()
+
+
+def test_compression_of_file_not_written_by_duckdb(tmp_path: Path) -> None:
+    """Test if file written by other library is compressed again with DuckDB parquet version."""
+    input_file_path = tmp_path / "input.parquet"
+    pq.write_table(
+        pa.table({"value": list(range(1_000))}),
+        input_file_path,
+        compression="snappy",
+        data_page_version="1.0",
+    )
+
+    with patch(
+        "rq_geo_toolkit.geoparquet_compression.run_duckdb_query_function_with_memory_limit",
+        wraps=run_duckdb_query_function_with_memory_limit,
+    ) as mock_function:
+        compressed_file_path = compress_parquet_with_duckdb(
+            input_file_path=input_file_path,
+            output_file_path=tmp_path / "compressed.parquet",
+            compression="snappy",
+            working_directory=tmp_path,
+        )
+        mock_function.assert_called_once()
+
+    assert pq.read_metadata(compressed_file_path).created_by.startswith("DuckDB")
+
+
+def test_zstd_compression_level_is_not_skipped(tmp_path: Path) -> None:
+    """Test if zstd file is compressed again with a different level unless skipping is enabled."""
+    input_file_path = tmp_path / "input.parquet"
+    pq.write_table(pa.table({"value": list(range(1_000))}), input_file_path)
+
+    zstd_file_path = compress_parquet_with_duckdb(
+        input_file_path=input_file_path,
+        output_file_path=tmp_path / "zstd_3.parquet",
+        compression="zstd",
+        compression_level=3,
+        working_directory=tmp_path,
+    )
+
+    with patch(
+        "rq_geo_toolkit.geoparquet_compression.run_duckdb_query_function_with_memory_limit",
+        wraps=run_duckdb_query_function_with_memory_limit,
+    ) as mock_function:
+        compress_parquet_with_duckdb(
+            input_file_path=zstd_file_path,
+            output_file_path=tmp_path / "zstd_22.parquet",
+            compression="zstd",
+            compression_level=22,
+            working_directory=tmp_path,
+        )
+        mock_function.assert_called_once()
+
+    with patch(
+        "rq_geo_toolkit.geoparquet_compression.run_duckdb_query_function_with_memory_limit",
+        side_effect=AssertionError,
+    ) as mock_function:
+        copied_file_path = compress_parquet_with_duckdb(
+            input_file_path=zstd_file_path,
+            output_file_path=tmp_path / "zstd_copied.parquet",
+            compression="zstd",
+            compression_level=22,
+            working_directory=tmp_path,
+            skip_if_compressed=True,
+        )
+        mock_function.assert_not_called()
+
+    assert copied_file_path.read_bytes() == zstd_file_path.read_bytes()
+
+
+def test_parquet_metadata_cache(tmp_path: Path) -> None:
+    """Test if parquet metadata is cached until the file is modified."""
+    file_path = tmp_path / "rows.parquet"
+    pq.write_table(pa.table({"value": list(range(10))}), file_path)
+
+    parquet_metadata = read_parquet_metadata(file_path)
+    assert read_parquet_metadata(file_path) is parquet_metadata
+    assert parquet_metadata.num_rows == 10
+
+    pq.write_table(pa.table({"value": list(range(100))}), file_path)
+    assert read_parquet_metadata(file_path).num_rows == 100